@@ -3,24 +3,63 @@ import numpy as np
 from matplotlib import pyplot as plt
 import matplotlib.animation
 import scipy.signal
+import scipy.fft
 import os.path
 import os
+import subprocess
 from json import JSONEncoder
 import json
 
 
-import warnings
-warnings.filterwarnings("ignore", category=np.VisibleDeprecationWarning) 
+try: # pyFFTW is optional - when available, FFT plans and aligned buffers are reused across frames
+    import pyfftw
+except ImportError:
+    pyfftw = None
+
+try: # Numba is optional - when available, the growth + clip update is fused into one compiled pass
+    import _kernels
+except ImportError:
+    _kernels = None
+
+try: # CuPy is optional - used to run the whole update step on an NVIDIA GPU (device='cuda')
+    import cupy
+except ImportError:
+    cupy = None
 
 from Board import Board
-from Kernel import Kernel
+from Kernel import Kernel, centre_pad
 from Growth_fn import Growth_fn
 
 MAX_FRAMES = 3000
+FFT_THREADS = os.cpu_count() or 1 # Number of threads used for planned (pyFFTW) transforms
+MIN_FFT_KERNEL_SIZE = 32 # Below this many kernel cells, direct convolution beats the FFT round trip
+
+# Lookup table for Conway's rules, indexed by (cell << 4) | neighbour_count.
+# Encodes birth on 3 neighbours and survival on 2 or 3 - see update_rule_default
+CONWAY_LUT = np.zeros(32, dtype=np.uint8)
+CONWAY_LUT[0*16 + 3] = 1 # dead cell, 3 neighbours -> born
+CONWAY_LUT[1*16 + 2] = 1 # live cell, 2 neighbours -> survives
+CONWAY_LUT[1*16 + 3] = 1 # live cell, 3 neighbours -> survives
 OUTPUT_PATH = './outputs'
 DATA_PATH = './datafiles'
 DEMO_PATH = './demos'
 
+GROWTH_LUT_SIZE = 4096 # Resolution of the tabulated growth function (see update_convolutional)
+
+if cupy is not None:
+    # Fused elementwise update for the GPU path: growth function, timestep and clip in a single
+    # kernel launch. Without this the post-FFT pipeline is three separate elementwise kernels
+    # (growth, add, clip), each reading and writing the whole board in device memory
+    fused_update_gaussian_gpu = cupy.ElementwiseKernel(
+        'float32 b, float32 n, float32 mu, float32 sig, float32 dT',
+        'float32 out',
+        '''
+        float g = 2.0f * expf(-(n - mu) * (n - mu) / (2.0f * sig * sig)) - 1.0f;
+        float v = b + dT * g;
+        out = v < 0.0f ? 0.0f : (v > 1.0f ? 1.0f : v);
+        ''',
+        'lenia_update_gaussian')
+
 class NumpyArrayEncoder(JSONEncoder):
     """Custom instace of JSONEncoder.
     Incorporates automatic serialisation of numpy arrays. 
@@ -40,8 +79,9 @@ class Automaton(Growth_fn):
                  board:object, 
                  kernel:object, 
                  growth_fn:object, 
-                 dT:float=0.1, 
-                 cmap:str='viridis'
+                 dT:float=0.1,
+                 cmap:str='viridis',
+                 device:str='cpu'
                  ):
         """
         Args:
@@ -50,16 +90,30 @@ class Automaton(Growth_fn):
             growth_fn (object): Instance of Growth_fn(). The growth function used to compute the update on the neighbourhood sum
             dT (float, optional): The timestep used. As dT tends to zero, time approaches continuum. Defaults to 0.1.
             cmap (str, optional): The colourmap used for plotting. Defaults to 'viridis'.
+            device (str, optional): Where to run the update step - 'cpu', or 'cuda' to keep the board
+                    resident on an NVIDIA GPU via CuPy (only a small readback per rendered frame). Defaults to 'cpu'.
         """
-        
-        # Local parameters 
+
+        # Local parameters
         self.cmap = cmap
         self.dT = dT
-        
+        self.device = device
+        if self.device == 'cuda' and cupy is None:
+            raise Exception('ERROR: device="cuda" requires CuPy (pip install cupy)')
+
+        # The board state (set before the kernel so the kernel FFT can be sized to the board).
+        # Stored as float32 - Lenia's dynamics are robust to single precision (the update clips
+        # to [0,1] anyway) and halving the byte width halves the memory traffic per frame
+        self.board = board.board.astype(np.float32)
+        self.board_shape = self.board.shape
+        self._h, self._w = self.board_shape # plain attributes - the shape is fixed for the run
+        if self.device == 'cuda':
+            self.board = cupy.asarray(self.board) # stays on-device for the whole simulation
+
         # Kernel paramaters
-        self.kernel = kernel 
-        self.normalise_kernel() # Normalise the kernel 
-        
+        self.kernel = kernel
+        self.normalise_kernel() # Normalise the kernel
+
         # Growth function parameters
         self.b1 = growth_fn.b1
         self.b2 = growth_fn.b2
@@ -67,19 +121,38 @@ class Automaton(Growth_fn):
         self.s2 = growth_fn.s2
         self.mu = growth_fn.mu
         self.sigma = growth_fn.sigma
-        self.type = growth_fn.type
+        self.type = growth_fn.type # the property setter also rebinds growth_fn to match
+        self.growth = self.growth_fn
+
+        # Tabulate the (smooth) growth function over the [0,1] neighbourhood-sum range so the
+        # fused update replaces a per-cell exp with an interpolated table lookup. The timestep
+        # dT is folded into the table, which also removes a multiply per cell
         if self.type == 'gaussian':
-            self.growth = self.growth_gaussian
-        elif self.type == 'bosco':
-            self.growth = self.growth_bosco
-        
-        # The board state
-        self.board = board.board
-        self.board_shape = self.board.shape
+            self._growth_lut = (self.dT * self.growth(np.linspace(0, 1, GROWTH_LUT_SIZE))).astype(np.float32)
+        else:
+            self._growth_lut = None
+
         self.fig, self.img = self.show_board() # Frames of animation
-        
+
+        # Output buffer for the fused (Numba) update - ping-ponged with the board each frame -
+        # and a growth buffer handed to Growth_fn on the unfused fallback path
+        self._update_out = np.empty_like(self.board)
+        self._growth_out = np.empty_like(self.board) if self.device != 'cuda' else None
+
         self.anim = None # Store the animation
+        self._frame_buf = None # Precomputed frames (see simulate)
     
+    def board_as_numpy(self) -> np.array:
+        """Return the board as a numpy array on the host.
+        On the 'cuda' device this is the single transfer per rendered frame.
+
+        Returns:
+            np.array: The current board state
+        """
+        if self.device == 'cuda':
+            return cupy.asnumpy(self.board)
+        return self.board
+
     def normalise_kernel(self) -> np.array:
         """Normalise the kernel such the values sum to 1. 
         This makes generalisations much easier and ensures that the range of the neighbourhood sums is independent 
@@ -89,9 +162,57 @@ class Automaton(Growth_fn):
         Returns:
             np.array: The resulting normlised kernel
         """
-        kernel_norm = self.kernel / (1*np.sum(self.kernel))
-        self.norm_factor = 1/ (1*np.sum(self.kernel))
-        self.kernel = kernel_norm 
+        if np.ndim(self.kernel) == 3:
+            # Stacked multi-shell kernel (Kernel.kernel_shell(stacked=True)). The board is
+            # single-channel and convolution is linear, so summing the shells in kernel space
+            # is exact and keeps the per-frame cost at a single transform pair
+            self.kernel = np.sum(self.kernel, axis=0)
+
+        kernel_sum = float(np.sum(self.kernel)) # single reduction, shared with norm_factor
+        self.norm_factor = 1 / kernel_sum
+        # C-contiguous and the same dtype as the board, so the convolution paths never have to
+        # cast or re-lay-out the kernel per frame
+        kernel_norm = np.ascontiguousarray(self.kernel / kernel_sum, dtype=np.float32)
+        self.kernel = kernel_norm
+
+        # For very small kernels (e.g. Conway's 3x3 Moore neighbourhood) the direct spatial
+        # convolution is cheaper than the FFT round trip, so keep it and skip the transform setup
+        self._use_fft = (kernel_norm.size >= MIN_FFT_KERNEL_SIZE) or (self.device == 'cuda')
+        if not self._use_fft:
+            self._fft = None
+            self._kernel_fft = None
+            return kernel_norm
+
+        # Precompute the FFT of the kernel, padded to the board size, so the per-frame convolution
+        # reduces to a single forward/inverse transform pair (see update_convolutional)
+        kernel_padded = centre_pad(kernel_norm, self.board_shape)
+
+        if self.device == 'cuda':
+            # Keep the kernel spectrum on-device; cuFFT plans are cached by CuPy per shape
+            self._fft = None
+            self._kernel_fft = cupy.fft.rfft2(cupy.asarray(kernel_padded))
+        elif pyfftw is not None:
+            # Plan the forward/inverse transforms once on aligned buffers. The board shape is
+            # fixed for the lifetime of the automaton, so every frame reuses the same FFTW plan
+            # (and its SIMD codelets) instead of re-planning and re-allocating scratch space
+            self._fft_in = pyfftw.empty_aligned(self.board_shape, dtype=kernel_padded.dtype)
+            self._fft = pyfftw.builders.rfft2(self._fft_in, threads=FFT_THREADS)
+            self._ifft_in = pyfftw.empty_aligned(self._fft.output_array.shape,
+                                                 dtype=self._fft.output_array.dtype)
+            self._ifft = pyfftw.builders.irfft2(self._ifft_in, s=self.board_shape, threads=FFT_THREADS)
+
+            self._fft_in[...] = kernel_padded
+            self._kernel_fft = self._fft().copy() # copy - the plan output buffer is reused
+        else:
+            self._fft = None
+            self._kernel_fft = scipy.fft.rfft2(kernel_padded, workers=-1)
+
+        # All kernels built by Kernel are centro-symmetric, which makes their spectrum real up
+        # to round-off. Keeping only the real part halves the spectrum's memory footprint and
+        # turns the per-frame spectral multiply into real-by-complex
+        if self.device != 'cuda' and np.allclose(self._kernel_fft.imag, 0, atol=1e-6):
+            self._kernel_fft = np.ascontiguousarray(self._kernel_fft.real)
+
         return kernel_norm
       
     def show_board(self, 
@@ -108,12 +229,17 @@ class Automaton(Growth_fn):
         """
         dpi = 50 # Using a higher dpi will result in higher quality graphics but will significantly affect computation
 
-        self.fig = plt.figure(figsize=(10*np.shape(self.board)[1]/dpi, 10*np.shape(self.board)[0]/dpi), dpi=dpi)
+        self.fig = plt.figure(figsize=(10*self._w/dpi, 10*self._h/dpi), dpi=dpi)
 
         ax = self.fig.add_axes([0, 0, 1, 1])
         ax.axis('off')
         
-        self.img = ax.imshow(self.board, cmap=self.cmap, interpolation='none', aspect=1, vmin=0) #  vmax=vmax
+        self.img = ax.imshow(self.board_as_numpy(), cmap=self.cmap, interpolation='none', aspect=1, vmin=0, vmax=1)
+        self.img.set_animated(True) # let blitting reuse the cached background between frames
+
+        # Colourmap applied directly in animate_step - bypasses matplotlib's per-frame
+        # rescale-and-remap pipeline, which dominates render time over thousands of frames
+        self._cmap_fn = plt.get_cmap(self.cmap)
         
         if display:
             plt.show()
@@ -139,10 +265,10 @@ class Automaton(Growth_fn):
         Returns:
             np.array: The updated board f(x,y,t+1) at time t+1 
         """
-        r1 = (neighbours == 3) # 3 neighbours -> lives
-        r2 = np.logical_and(self.board, (neighbours == 2)) # 2 neighbours and alive -> lives
-        r3 = np.logical_or(r1,r2).astype(int) # all other -> dead
-        return r3
+        # Single branchless gather through the rule lookup table - one pass over the board
+        # instead of separate ==/and/or/cast passes
+        idx = (self.board.astype(np.uint8) << 4) | neighbours.astype(np.uint8)
+        return CONWAY_LUT[idx]
     
     def update_convolutional(self) -> np.array:
         """Update the board state using the convolution method to calculate the neighbourhood sum
@@ -160,12 +286,43 @@ class Automaton(Growth_fn):
         """
         
         # Calculate the neighbourhood sum by convolution with the kernel.
-        # Use periodic boundary conditions to 'wrap' the grid in the x and y dimensions
-        neighbours = scipy.signal.convolve2d(self.board, self.kernel, mode='same', boundary='wrap')
-        
-        # Update the board as per the growth function and timestep dT, clipping values to the range 0..1
-        self.board = np.clip(self.board + self.dT * self.growth(neighbours), 0, 1)
-        
+        # The periodic ('wrap') boundary conditions map exactly onto circular convolution, so the
+        # sum is computed in Fourier space using the pre-computed kernel FFT. This is
+        # O(N^2 logN) per frame rather than O(N^2 K^2) for the direct spatial convolution
+        if self.device == 'cuda':
+            # Everything stays on the GPU - the only host transfer is the readback for rendering
+            neighbours = cupy.fft.irfft2(cupy.fft.rfft2(self.board) * self._kernel_fft, s=self.board_shape)
+            if self.type == 'gaussian': # Fused single-kernel update (see fused_update_gaussian_gpu)
+                self.board = fused_update_gaussian_gpu(self.board, neighbours,
+                                                       np.float32(self.mu), np.float32(self.sigma),
+                                                       np.float32(self.dT))
+            else:
+                self.board = cupy.clip(self.board + self.dT * self.growth(neighbours), 0, 1)
+            return self.board
+
+        if not self._use_fft: # Small-kernel regime - direct spatial convolution wins
+            neighbours = scipy.signal.convolve2d(self.board, self.kernel, mode='same', boundary='wrap')
+        elif self._fft is not None: # Planned pyFFTW path - no per-frame allocation
+            self._fft_in[...] = self.board
+            np.multiply(self._fft(), self._kernel_fft, out=self._ifft_in)
+            neighbours = self._ifft()
+        else:
+            neighbours = scipy.fft.irfft2(scipy.fft.rfft2(self.board, workers=-1) * self._kernel_fft,
+                                          s=self.board_shape, workers=-1)
+        
+        # Update the board as per the growth function and timestep dT, clipping values to the range 0..1.
+        # With Numba available this is a single fused pass writing into a reused buffer
+        if _kernels is not None and self.type == 'gaussian':
+            _kernels.fused_update_lut(self.board, neighbours, self._growth_lut, self._update_out)
+            self.board, self._update_out = self._update_out, self.board
+        elif _kernels is not None and self.type == 'bosco':
+            _kernels.fused_update_bosco(self.board, neighbours, self.b1, self.b2, self.s1, self.s2, self.dT, self._update_out)
+            self.board, self._update_out = self._update_out, self.board
+        else:
+            growth = self.growth(neighbours, out=self._growth_out if self.type == 'gaussian' else None)
+            np.clip(self.board + self.dT * growth, 0, 1, out=self._update_out)
+            self.board, self._update_out = self._update_out, self.board
+
         return self.board
         
     
@@ -181,15 +338,53 @@ class Automaton(Growth_fn):
         """
         
         self.update_convolutional() # update the board
-        self.img.set_array(self.board) # render the updated state 
+        # Map the board (already clipped to [0,1]) straight to RGBA bytes - no renormalisation
+        self.img.set_data(self._cmap_fn(self.board_as_numpy(), bytes=True))
         return self.img,
     
-    def animate(self, 
-                frames:int, 
-                interval:float=50, 
+    def simulate(self,
+                 frames:int,
+                 ) -> np.array:
+        """Run the simulation for a number of timesteps, recording each board state into a
+        preallocated frame buffer.
+
+        Splits 'simulate' (compute-bound, fused/compiled update loop) from 'render'
+        (matplotlib) - the animation then only replays recorded frames, so per-frame dispatch
+        cost during rendering is trivial.
+
+        Args:
+            frames (int): The number of frames/timesteps to simulate.
+
+        Returns:
+            np.array: The (frames, height, width) buffer of board states
+        """
+        buf = np.empty((frames,) + self.board_shape, dtype=np.float32)
+        for i in range(frames):
+            self.update_convolutional()
+            buf[i] = self.board_as_numpy()
+
+        self._frame_buf = buf
+        return buf
+
+    def playback_step(self, i:int) -> plt.imshow:
+        """Render a single precomputed frame from the buffer filled by simulate.
+
+        Args:
+            i (int): The frame number
+
+        Returns:
+            plt.axes.imshow: The rendered image of the board at frame i
+        """
+        self.img.set_data(self._cmap_fn(self._frame_buf[i], bytes=True))
+        return self.img,
+
+    def animate(self,
+                frames:int,
+                interval:float=50,
                 blit=True,
+                precompute:bool=True,
                 ):
-        """The main input point for creating a cellular automata animation. 
+        """The main input point for creating a cellular automata animation.
         Simulates and renders the cellular automata as a matplotlib.animation.FuncAnimation.
         This can then be saved using ffmpeg.
 
@@ -199,9 +394,18 @@ class Automaton(Growth_fn):
             blit (bool, optional): Whether to use blitting to render the images. This improves the performace
                     by reducing the amount of unnecessary pixel updates. Defaults to False.
                     https://matplotlib.org/3.5.0/tutorials/advanced/blitting.html
+            precompute (bool, optional): Run the whole simulation up-front (see simulate) and
+                    animate from the recorded frames, rather than stepping the simulation from
+                    inside the matplotlib callback. Defaults to True.
         """
         # Animate Lenia
-        self.anim = matplotlib.animation.FuncAnimation(self.fig, self.animate_step, 
+        self.n_frames = frames # remembered for the direct ffmpeg writer in save_animation
+        if precompute:
+            self.simulate(frames)
+            step = self.playback_step
+        else:
+            step = self.animate_step
+        self.anim = matplotlib.animation.FuncAnimation(self.fig, step,
                                                 frames=frames, interval=interval, save_count=MAX_FRAMES, blit=blit)
         
     def save_animation(self, 
@@ -237,12 +441,49 @@ class Automaton(Growth_fn):
             writer = matplotlib.animation.PillowWriter(fps=30) 
             self.anim.save(f, writer=writer)
         elif fmt == '.mp4':
-            f = os.path.join(OUTPUT_PATH, filename) 
-            writer = matplotlib.animation.FFMpegWriter(fps=30) 
-            self.anim.save(f, writer=writer)
+            f = os.path.join(OUTPUT_PATH, filename)
+            self.write_frames_ffmpeg(f, self.n_frames)
         else:
             raise Exception('ERROR: Unknown save format. Must be .gif or .mp4')
 
+    def write_frames_ffmpeg(self,
+                            path:str,
+                            frames:int,
+                            fps:int=30,
+                            ) -> None:
+        """Simulate and stream raw RGBA frames straight into ffmpeg's stdin.
+
+        matplotlib's FFMpegWriter re-renders the whole figure for every frame; for a single
+        full-axes image that pipeline dominates save time. Writing the colourmapped board
+        directly makes the throughput simulation + encoding only.
+
+        Args:
+            path (str): Destination .mp4 path
+            frames (int): The number of frames/timesteps to simulate
+            fps (int, optional): Frames per second of the output video. Defaults to 30.
+        """
+        cmd = ['ffmpeg', '-y', '-f', 'rawvideo', '-pix_fmt', 'rgba',
+               '-s', '{}x{}'.format(self._w, self._h), '-r', str(fps), '-i', '-',
+               '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', # x264 requires even dimensions
+               '-pix_fmt', 'yuv420p', '-c:v', 'libx264', path]
+        try:
+            pipe = subprocess.Popen(cmd, stdin=subprocess.PIPE,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except FileNotFoundError:
+            raise Exception('ERROR: ffmpeg not found. Install ffmpeg to save .mp4 animations')
+
+        try:
+            for i in range(frames):
+                if self._frame_buf is not None and i < len(self._frame_buf): # replay recorded frames
+                    frame = self._frame_buf[i]
+                else:
+                    self.update_convolutional()
+                    frame = self.board_as_numpy()
+                pipe.stdin.write(self._cmap_fn(frame, bytes=True).tobytes())
+        finally:
+            pipe.stdin.close()
+            pipe.wait()
+
     def save_json(self, 
                   filename:str,
                   ) -> dict:
@@ -260,15 +501,32 @@ class Automaton(Growth_fn):
         """
         
         fmt = os.path.splitext(filename)[1]
-        
+
         try: # make outputs folder if not already exists
             os.makedirs(DATA_PATH)
         except FileExistsError: # directory already exists
             pass
-        
+
         if not fmt == '.json':
             raise Exception('ERROR: Must save as .json')
-            
+
+        d_save = self.scalar_state()
+
+        d_save['board'] = self.board_as_numpy()
+        d_save['kernel'] = self.kernel
+
+        with open(os.path.join(DATA_PATH, filename), 'w') as fp:
+            json.dump(d_save, fp, cls=NumpyArrayEncoder) # Automatic serialization of numpy arrays
+
+        return(d_save)
+
+    def scalar_state(self) -> dict:
+        """Collect the scalar parameters (timestep, colourmap and growth function values) as a dict.
+        Used by save_json and save_state.
+
+        Returns:
+            dict: The scalar parameters
+        """
         d_save = {}
 
         d_save['dt'] = self.dT
@@ -282,11 +540,39 @@ class Automaton(Growth_fn):
         d_save['mu'] = self.mu
         d_save['sigma'] = self.sigma
 
-        d_save['board'] = self.board
-        d_save['kernel'] = self.kernel
+        return d_save
 
-        with open(os.path.join(DATA_PATH, filename), 'w') as fp: 
-            json.dump(d_save, fp, cls=NumpyArrayEncoder) # Automatic serialization of numpy arrays
+    def save_state(self,
+                   filename:str,
+                   ) -> dict:
+        """Save the current state with the board and kernel in compressed binary (.npz) form and
+        the scalar parameters in a small .json sidecar of the same name.
+
+        Serialising the arrays through json (save_json) materialises one Python float per cell,
+        which is 10-50x slower and ~8x larger on disk - prefer this for big boards.
+        Files are stored in ./datafiles by default; the .json sidecar can be loaded with Lenia.py
+        exactly like a legacy all-json save.
+
+        Args:
+            filename (str): The filename (the extension, if given, is replaced by .json/.npz).
+
+        Returns:
+            dict: The state dict written to the .json sidecar.
+        """
+        try: # make outputs folder if not already exists
+            os.makedirs(DATA_PATH)
+        except FileExistsError: # directory already exists
+            pass
+
+        name = os.path.splitext(filename)[0]
+        np.savez_compressed(os.path.join(DATA_PATH, name + '.npz'),
+                            board=self.board_as_numpy(), kernel=self.kernel)
+
+        d_save = self.scalar_state()
+        d_save['arrays'] = name + '.npz' # the sidecar points at the binary arrays
+
+        with open(os.path.join(DATA_PATH, name + '.json'), 'w') as fp:
+            json.dump(d_save, fp)
 
         return(d_save)
 
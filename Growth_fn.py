@@ -1,75 +1,174 @@
-#!/usr/bin/env python
-# -*- coding: utf-8 -*-
-
-# Lewis Howell 20/04/22
-
-import numpy as np
-
-class Growth_fn(object):
-    """Class for the growth function which is used to update the board based on the neighbourhood sum.
-    This replaces the traditional conditional update used in Conway's game of life and can be generalised to any
-    continous function. 
-    
-    f(x,y,t+1) = g(k*f(x,y,t))
-    
-    where g is the growth function
-    k is the update kernel 
-    f(x,y,t) is the board state at time t
-    N.b. The operator * is the convolution operator 
-    
-    It consists of growth and shrink parts, which act on the neighbourhood sum to update the board at each timestep.
-    """
-    def __init__(self):
-        
-        # Values for Bosco's update rule
-        self.b1 = 2*0.125
-        self.b2 = 4*0.125
-        self.s1 = 3*0.125
-        self.s2 = 4*0.125
-        
-        # Values for Gaussian update rule
-        self.mu = 0.135
-        self.sigma = 0.015
-        
-        # Use Gaussian by default (Lenia)
-        self.type = 'gaussian'
-        if self.type == 'gaussian':
-            self.growth_fn = self.growth_gaussian
-        elif self.type == 'bosco':
-            self.growth_fn = self.growth_bosco
-    
-    def growth_conway(self, U:np.array) -> np.array:
-        """Conditinal update rule for Conway's game of life
-        b1..b2 is birth range, s1..s2 is stable range (outside s1..s2 is the shrink range) 
-
-        Args:
-            U (np.array): The neighbourhood sum 
-
-        Returns:
-            np.array: The updated board at time t = t+1
-        """
-        return 0 + (U==3) - ((U<2)|(U>3))
-    
-    def growth_bosco(self, U:np.array) -> np.array:
-        """Bosco's rule update for an extended Moore neighbourhood
-
-        Args:
-            U (np.array): The neighbourhood sum 
-
-        Returns:
-            np.array: The updated board at time t = t+1
-        """
-        return 0 + ((U>=self.b1)&(U<self.b2)) - ((U<self.s1)|(U>=self.s2))
-    
-    def growth_gaussian(self, U:np.array) -> np.array:
-        """Use a smooth Gaussian growth function to update the board, based on the neighbourhood sum.
-        This is the function used by Lenia to achive smooth, fluid-like patterns.
-
-        Args:
-            U (np.array): The neighbourhood sum 
-
-        Returns:
-            np.array: The updated board at time t = t+1
-        """
-        gaussian = lambda x, m, s: np.exp(-( (x-m)**2 / (2*s**2) ))
-        return gaussian(U, self.mu, self.sigma)*2-1
\ No newline at end of file
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Lewis Howell 20/04/22
+
+import numpy as np
+
+try: # Numba is optional - the compiled kernels evaluate each growth function in one fused pass
+    import _kernels
+except ImportError:
+    _kernels = None
+
+DTYPE = np.float32 # fp32 is plenty for the growth values and matches the board dtype
+
+class Growth_fn(object):
+    """Class for the growth function which is used to update the board based on the neighbourhood sum.
+    This replaces the traditional conditional update used in Conway's game of life and can be generalised to any
+    continous function. 
+    
+    f(x,y,t+1) = g(k*f(x,y,t))
+    
+    where g is the growth function
+    k is the update kernel 
+    f(x,y,t) is the board state at time t
+    N.b. The operator * is the convolution operator 
+    
+    It consists of growth and shrink parts, which act on the neighbourhood sum to update the board at each timestep.
+    """
+    def __init__(self):
+        
+        # Values for Bosco's update rule
+        self.b1 = 2*0.125
+        self.b2 = 4*0.125
+        self.s1 = 3*0.125
+        self.s2 = 4*0.125
+        
+        # Values for Gaussian update rule
+        self.mu = 0.135
+        self.sigma = 0.015
+        
+        # Use Gaussian by default (Lenia)
+        self.type = 'gaussian'
+
+    @property
+    def type(self):
+        """str: Which growth function to use ('gaussian', 'bosco' or 'conway').
+        Setting it rebinds growth_fn, so changing the type after construction takes effect.
+        """
+        return self._type
+
+    @type.setter
+    def type(self, value):
+        dispatch = {'gaussian': self.growth_gaussian,
+                    'bosco': self.growth_bosco,
+                    'conway': self.growth_conway}
+        if value not in dispatch:
+            raise Exception('ERROR: Unknown growth function type: {}. Choose from {}'.format(value, list(dispatch.keys())))
+        self._type = value
+        self.growth_fn = dispatch[value]
+
+    @property
+    def sigma(self):
+        """float: The stdev of the Gaussian growth function.
+        Setting it also refreshes the cached -1/(2*sigma^2) factor used on every growth evaluation.
+        """
+        return self._sigma
+
+    @sigma.setter
+    def sigma(self, value):
+        self._sigma = value
+        self._neg_inv_2s2 = -1.0 / (2.0 * value**2)
+
+    def _int8_buffer(self, shape) -> np.array:
+        """Return the reused int8 output buffer for the compiled conway/bosco kernels,
+        (re)allocating it if the shape has changed."""
+        buf = getattr(self, '_out_i8', None)
+        if buf is None or buf.shape != shape:
+            buf = self._out_i8 = np.empty(shape, dtype=np.int8)
+        return buf
+
+    def __call__(self, U:np.array, out:np.array=None) -> np.array:
+        """Evaluate the currently selected growth function (see the type property).
+
+        Args:
+            U (np.array): The neighbourhood sum
+            out (np.array, optional): Caller-owned buffer to write the growth values into,
+                so a caller evaluating once per frame avoids a board-sized allocation each
+                call. Defaults to None (an internal reused buffer is used instead).
+
+        Returns:
+            np.array: The growth values
+        """
+        return self.growth_fn(U, out=out)
+
+    def growth_conway(self, U:np.array, out:np.array=None) -> np.array:
+        """Conditinal update rule for Conway's game of life
+        b1..b2 is birth range, s1..s2 is stable range (outside s1..s2 is the shrink range)
+
+        Args:
+            U (np.array): The neighbourhood sum
+            out (np.array, optional): int8 buffer to write into. Defaults to None.
+
+        Returns:
+            np.array: The updated board at time t = t+1 (without out, the compiled path
+            returns a buffer reused between calls - copy it if the values must survive)
+        """
+        if _kernels is not None and np.ndim(U) == 2:
+            if out is None:
+                out = self._int8_buffer(U.shape)
+            _kernels.conway_growth(U, out)
+            return out
+
+        growth = 0 + (U==3) - ((U<2)|(U>3))
+        if out is not None:
+            out[...] = growth
+            return out
+        return growth
+
+    def growth_bosco(self, U:np.array, out:np.array=None) -> np.array:
+        """Bosco's rule update for an extended Moore neighbourhood
+
+        Args:
+            U (np.array): The neighbourhood sum
+            out (np.array, optional): int8 buffer to write into. Defaults to None.
+
+        Returns:
+            np.array: The updated board at time t = t+1 (without out, the compiled path
+            returns a buffer reused between calls - copy it if the values must survive)
+        """
+        if _kernels is not None and np.ndim(U) == 2:
+            if out is None:
+                out = self._int8_buffer(U.shape)
+            _kernels.bosco_growth(U, self.b1, self.b2, self.s1, self.s2, out)
+            return out
+
+        growth = 0 + ((U>=self.b1)&(U<self.b2)) - ((U<self.s1)|(U>=self.s2))
+        if out is not None:
+            out[...] = growth
+            return out
+        return growth
+
+    def growth_gaussian(self, U:np.array, out:np.array=None) -> np.array:
+        """Use a smooth Gaussian growth function to update the board, based on the neighbourhood sum.
+        This is the function used by Lenia to achive smooth, fluid-like patterns.
+
+        Args:
+            U (np.array): The neighbourhood sum
+            out (np.array, optional): float buffer to write into. Defaults to None.
+
+        Returns:
+            np.array: The updated board at time t = t+1 (without out, this is a buffer
+            reused between calls - copy it if the values must survive the next call)
+        """
+        if _kernels is not None and np.ndim(U) == 2:
+            # Compiled single-pass evaluation into the output buffer
+            if out is None:
+                out = getattr(self, '_out', None)
+                if out is None or out.shape != U.shape:
+                    out = self._out = np.empty_like(U)
+            _kernels.gauss_growth(U, self.mu, -self._neg_inv_2s2, out)
+            return out
+
+        # In-place ufunc chain through the output buffer - no temporaries, no per-call lambda
+        if out is None:
+            out = getattr(self, '_buf', None)
+            if out is None or out.shape != np.shape(U):
+                out = self._buf = np.empty_like(U, dtype=DTYPE)
+        np.subtract(U, self.mu, out=out)
+        np.multiply(out, out, out=out)
+        np.multiply(out, self._neg_inv_2s2, out=out)
+        np.exp(out, out=out)
+        out *= 2
+        out -= 1
+        return out
\ No newline at end of file
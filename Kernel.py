@@ -4,6 +4,74 @@
 # Lewis Howell 20/04/22
 
 import numpy as np
+import scipy.fft
+from functools import lru_cache
+
+try: # Numba is optional - the compiled helper fills radial-distance grids in parallel
+    import _kernels
+except ImportError:
+    _kernels = None
+
+
+def radial_field(size:int,
+                 R:float,
+                 ) -> np.array:
+    """Build a size x size grid of each cell's distance from the centre, scaled by 1/R.
+
+    This is the shared starting point for the radially-symmetric kernels and board
+    initialisations. With Numba available the grid is filled row-parallel in compiled code;
+    otherwise it falls back to broadcasting with np.hypot.
+
+    Args:
+        size (int): The side length of the grid
+        R (float): The radius to scale distances by (the centre sits at (R-1, R-1))
+
+    Returns:
+        np.array: The radial distance field
+    """
+    if _kernels is not None:
+        D = np.empty((size, size))
+        _kernels.radial_distance(D, float(R))
+        return D
+
+    yy, xx = np.ogrid[:size, :size]
+    return np.hypot(yy - (R - 1), xx - (R - 1)) / R
+
+
+def _gauss_bell(x:np.array,
+                mu:float,
+                sigma:float,
+                ) -> np.array:
+    """The Gaussian bell exp(-(x-mu)^2 / 2*sigma^2) used to smooth the ring kernels.
+
+    Args:
+        x (np.array): The input values (radial distances)
+        mu (float): The mean of the bell
+        sigma (float): The stdev of the bell
+
+    Returns:
+        np.array: The bell evaluated at x
+    """
+    return np.exp(-( (x-mu)**2 / (2*sigma**2) ))
+
+
+def centre_pad(kernel:np.array,
+               shape:tuple,
+               ) -> np.array:
+    """Zero-pad a kernel to the given 2D shape with its centre moved to (0,0), ready for
+    circular ('wrap') convolution via FFT.
+
+    Args:
+        kernel (np.array): The (small) convolution kernel
+        shape (tuple): The board shape to pad to
+
+    Returns:
+        np.array: The padded, origin-centred kernel
+    """
+    kh, kw = kernel.shape
+    padded = np.zeros(shape, dtype=kernel.dtype)
+    padded[:kh, :kw] = kernel
+    return np.roll(padded, (-(kh // 2), -(kw // 2)), axis=(0, 1))
 
 
 class Kernel(object):
@@ -17,7 +85,33 @@ class Kernel(object):
     """
     def __init__(self):
         self.kernel = self.smooth_ring_kernel(16)
-        
+
+    def fft_cached(self,
+                   board_shape:tuple,
+                   ) -> np.array:
+        """Return the rfft2 of this kernel (normalised to sum to 1), zero-padded to the board
+        shape and centred on the origin - the spectrum used for per-frame circular convolution.
+
+        Memoized per board shape, so repeated simulations over the same board size (e.g. a
+        parameter sweep) reuse the transform instead of recomputing it. The kernel itself is
+        fixed for the lifetime of a Kernel instance.
+
+        Args:
+            board_shape (tuple): The shape of the board the kernel will be convolved with
+
+        Returns:
+            np.array: The cached kernel spectrum (do not modify in place)
+        """
+        cache = getattr(self, '_fft_cache', None)
+        if cache is None:
+            cache = self._fft_cache = {}
+
+        key = tuple(board_shape)
+        if key not in cache:
+            kernel_norm = (self.kernel / np.sum(self.kernel)).astype(np.float32)
+            cache[key] = scipy.fft.rfft2(centre_pad(kernel_norm, key), workers=-1)
+        return cache[key]
+
     def square_kernel(self, 
                       outer_diameter:int, 
                       inner_diameter:int,
@@ -51,10 +145,13 @@ class Kernel(object):
             print('ERROR: Outer diameter (= {}) must be greater than inner (= {})'.format(outer_diameter,inner_diameter))
             return None
 
-        inner = np.pad(np.ones([inner_diameter,inner_diameter]),(outer_diameter-inner_diameter) // 2)
-        outer = np.ones([outer_diameter,outer_diameter])
+        # Allocate at the final size and zero the inner block directly - avoids building the
+        # inner array and an np.pad copy of it
+        kernel = np.ones([outer_diameter,outer_diameter])
+        offset = (outer_diameter-inner_diameter) // 2
+        kernel[offset:offset+inner_diameter, offset:offset+inner_diameter] = 0
 
-        return outer - inner
+        return kernel
     
     def circular_kernel(self, 
                         diameter:int, 
@@ -115,10 +212,13 @@ class Kernel(object):
             print('ERROR: Use both odd or both even dimensions to ensure kernel symmetry')
             return None
 
-        inner = np.pad(self.circular_kernel(inner_diameter),(outer_diameter-inner_diameter) // 2)
-        outer = self.circular_kernel(outer_diameter)
+        # Subtract the inner circle in place over the centre of the outer one - avoids the
+        # intermediate np.pad allocation and copy
+        kernel = self.circular_kernel(outer_diameter)
+        offset = (outer_diameter-inner_diameter) // 2
+        kernel[offset:offset+inner_diameter, offset:offset+inner_diameter] -= self.circular_kernel(inner_diameter)
 
-        return outer - inner
+        return kernel
     
     def smooth_ring_kernel(self, 
                            diameter:int, 
@@ -136,18 +236,35 @@ class Kernel(object):
         Returns:
             np.array: The resulting kernel
         """
+        return Kernel._smooth_ring_kernel_cached(int(diameter), float(mu), float(sigma))
+
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def _smooth_ring_kernel_cached(diameter:int,
+                                   mu:float,
+                                   sigma:float
+                                   ) -> np.array:
+        """Build (or fetch from cache) the smooth ring kernel for a given parameter set.
+        Kernels are deterministic functions of their parameters, so repeated construction
+        (e.g. during a parameter sweep) reuses the cached array.
+
+        Returns:
+            np.array: The resulting kernel (read-only - cached and shared between calls)
+        """
         R = (diameter / 2) + 1 # radius
-        gaussian = lambda x, m, s: np.exp(-( (x-m)**2 / (2*s**2) ))
-        D = np.linalg.norm(np.asarray(np.ogrid[-R:R-1, -R:R-1]) + 1) / R
-        
-        return (D<1) * gaussian(D, mu, sigma)
+        D = radial_field(int(2*R) - 1, R) # radial distance from the centre
+
+        kernel = (D<1) * _gauss_bell(D, mu, sigma)
+        kernel.setflags(write=False)
+        return kernel
     
-    def kernel_shell(self, 
-                     diameter:int, 
-                     peaks:np.array(float)=np.array([1/2, 2/3, 1]), 
-                     mu:float=0.5, 
-                     sigma:float=0.15, 
-                     a:float=4.0
+    def kernel_shell(self,
+                     diameter:int,
+                     peaks:np.array(float)=(1/2, 2/3, 1),
+                     mu:float=0.5,
+                     sigma:float=0.15,
+                     a:float=4.0,
+                     stacked:bool=False
                      ) -> np.array:
         """Extend the kernal to multiple smooth rings ('shells').
         The number of shells can be changed by changing the number of items in 'peaks'.
@@ -156,21 +273,49 @@ class Kernel(object):
 
         Args:
             diameter (int): The outer diameter of the kernel ones (equal to the kernel size).
-            peaks (np.array, optional): The amplitude of the peaks for the shells, from inner to outer. 
-                Defaults to np.array([1/2, 2/3, 1]).
+            peaks (array-like, optional): The amplitude of the peaks for the shells, from inner
+                to outer. Defaults to (1/2, 2/3, 1).
             mu (float, optional): The mean value for Gaussian smoothing. Defaults to 0.5.
             sigma (float, optional): The stdev value for Gaussian smoothing. Defaults to 0.15.
             a (float, optional): The pre-factor for gaussian smoothing. Defaults to 4.0.
+            stacked (bool, optional): Return the shells as a (n_shells, size, size) stack with one
+                ring per channel, rather than summed into a single dense kernel. Intended for
+                multi-channel extensions; Automaton accepts either form. Defaults to False.
 
         Returns:
-            np.array: The resulting kernel
+            np.array: The resulting kernel (read-only - cached and shared between calls)
+        """
+        return Kernel._kernel_shell_cached(int(diameter), tuple(float(p) for p in np.ravel(peaks)),
+                                           float(mu), float(sigma), float(a), bool(stacked))
+
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def _kernel_shell_cached(diameter:int,
+                             peaks:tuple,
+                             mu:float,
+                             sigma:float,
+                             a:float,
+                             stacked:bool
+                             ) -> np.array:
+        """Build (or fetch from cache) the shell kernel for a given parameter set.
+        As with _smooth_ring_kernel_cached, kernels are deterministic functions of their
+        parameters, so parameter sweeps reuse the cached array.
+
+        Returns:
+            np.array: The resulting kernel (read-only - cached and shared between calls)
         """
+        peaks = np.asarray(peaks)
         R = int(diameter / 2) + 1
-        D = np.linalg.norm(np.asarray(np.ogrid[-R:R-1, -R:R-1]) + 1) / R
+        D = radial_field(2*R - 1, R) # radial distance from the centre
         k = len(peaks)
         kr = k * D
 
-        peak = peaks[np.minimum(np.floor(kr).astype(int), k-1)]
-        gaussian = lambda x, m, s: a*np.exp(-( (x-m)**2 / (2*s**2) ))
+        zone = np.minimum(np.floor(kr).astype(int), k-1) # which shell each cell falls in
+        rings = (D<1) * a*_gauss_bell(kr % 1, mu, sigma)
 
-        return (D<1) * gaussian(kr % 1, mu, sigma) * peak
\ No newline at end of file
+        if stacked:
+            kernel = np.stack([np.where(zone == c, rings * peaks[c], 0.0) for c in range(k)], axis=0)
+        else:
+            kernel = rings * peaks[zone]
+        kernel.setflags(write=False)
+        return kernel
\ No newline at end of file
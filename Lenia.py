@@ -4,18 +4,26 @@
 # Lewis Howell 20/04/22
 
 # Imports
-from Board import Board
+from Board import Board, DTYPE
 from Kernel import Kernel
 from Growth_fn import Growth_fn
 from Automaton import Automaton
 
 import argparse
 import numpy as np
-from matplotlib import pyplot as plt
+from functools import lru_cache
 import json
+import os.path
+
+try: # orjson is optional - it decodes the large legacy all-json saves several times faster
+    import orjson
+except ImportError:
+    orjson = None
 
 NUMERIC_ARGS = ['board_size', 'kernel_size', 'dt', 'frames', 'sigma', 'mu', 'seed']
+GROWTH_KEYS = ('b1', 'b2', 's1', 's2', 'mu', 'sigma', 'type') # Growth_fn attributes settable from args/files
 OPTIONAL_ARGS = ['board_size', 'kernel_size', 'dt', 'frames', 'sigma', 'mu', 'seed', 'b1', 'b2', 's1', 's2']
+_KEBAB = {arg: arg.replace('_', '-') for arg in OPTIONAL_ARGS} # CLI spellings for error messages
 DEMOS = {
         'demo':'./demos/orbium_unicaudatus.json',
         'orbium':'./demos/orbium_unicaudatus.json',
@@ -41,6 +49,9 @@ DEMOS = {
 def load_from_json(filename:str) -> dict:
     """Load parameters and board/kernel states from a .json file. Allows restoration of previous simulation states.
 
+    Deserialized states are cached per (filename, mtime), so repeated loads of the same
+    demo in one session skip the decode; a changed file on disk misses the cache.
+
     Args:
         filename (str): The filename to load.
 
@@ -49,14 +60,53 @@ def load_from_json(filename:str) -> dict:
     """
     # Deserialization
     print("Reading JSON file...")
-    with open(filename, "r") as read_file:
-        d_load = json.load(read_file)
+    d_load = _load_json_cached(filename, os.path.getmtime(filename))
+    return dict(d_load) # shallow copy - callers overwrite entries (outfile, frames, ...)
 
-        d_load["board"] = np.asarray(d_load["board"]) # Deserialise arrays
-        d_load["kernel"] = np.asarray(d_load["kernel"])
+@lru_cache(maxsize=8)
+def _load_json_cached(filename:str, mtime:float) -> dict:
+    """Read and decode a saved state file, via orjson when available.
+
+    Args:
+        filename (str): The filename to load.
+        mtime (float): The file's modification time - part of the cache key only.
+
+    Returns:
+        dict: The state dictionary (shared between calls - do not mutate)
+    """
+    with open(filename, "rb") as read_file:
+        d_load = orjson.loads(read_file.read()) if orjson is not None else json.loads(read_file.read())
+
+    if "arrays" in d_load: # Binary sidecar written by Automaton.save_state
+        arrays = np.load(os.path.join(os.path.dirname(filename), d_load["arrays"]))
+        d_load["board"] = arrays["board"]
+        d_load["kernel"] = arrays["kernel"]
+    else: # Legacy all-json save
+        d_load["board"] = np.asarray(d_load["board"], dtype=DTYPE) # Deserialise arrays
+        d_load["kernel"] = np.asarray(d_load["kernel"], dtype=DTYPE)
+
+    return d_load
+
+def _coerce(d_data:dict, key:str, typ:type, default):
+    """Fetch d_data[key] coerced to typ, or default when the key is absent or None.
+
+    Unlike the try/except probes this replaces, only a *missing* value falls back to the
+    default - a present-but-invalid value raises, so typos are not silently ignored.
+
+    Args:
+        d_data (dict): The parameter dict
+        key (str): The key to fetch
+        typ (type): The type to coerce the value to
+        default: The value to use when the key is missing or None
+
+    Returns:
+        The coerced value, or default
+    """
+    value = d_data.get(key)
+    if value is None:
+        return default
+    return typ(value)
 
-        return d_load
-    
 def print_demos() -> None:
     """Print the list of available demos as a nicely formatted list"""
     print('Choose demos from:')
@@ -208,98 +258,68 @@ def run_simulation(d_data:dict) -> None:
     - The number of frames to simulate and output format
 
     Args:
-        d_data (dict): The parameters 
+        d_data (dict): The parameters
     """
-    
+
     # Kernel
-    kernel_size = 16
-    try:
-        if d_data['kernel_size'] != None: kernel_size = int(d_data['kernel_size'])
-    except: pass
-    
-    kernel_peaks = np.array([1])
-    try:
-        if d_data['kernel_peaks'] != None: kernel_peaks = np.array([float(i) for i in d_data['kernel_peaks']])
-    except: pass
-        
-    kernel = Kernel().kernel_shell(kernel_size, peaks=kernel_peaks) # Create kernel
-    try: kernel = d_data['kernel'] # use kernel provided (if exists)
-    except: pass  
-    
-    # Growth fn
+    kernel_size = _coerce(d_data, 'kernel_size', int, 16)
+
+    kernel_peaks = d_data.get('kernel_peaks') # hashable, so kernel construction is memoized across runs
+    kernel_peaks = (1.0,) if kernel_peaks is None else tuple(float(i) for i in kernel_peaks)
+
+    kernel = d_data.get('kernel') # use kernel provided, else create one
+    if kernel is None:
+        kernel = Kernel().kernel_shell(kernel_size, peaks=kernel_peaks)
+    else:
+        kernel = np.asarray(kernel, dtype=DTYPE)
+    
+    # Growth fn - overwrite the defaults with any values provided.
+    # Driven by GROWTH_KEYS rather than chained try/excepts, so a bad value (e.g. an unknown
+    # growth type) raises instead of silently falling back to the defaults
     growth_fn = Growth_fn()
-    
-    # If provided
-    try: growth_fn.b1 = d_data['b1']
-    except: pass
-    try: growth_fn.b2 = d_data['b2']
-    except: pass
-    try: growth_fn.s1 = d_data['s1']
-    except: pass
-    try: growth_fn.s2 = d_data['s2']
-    except: pass
-    try: growth_fn.type = d_data['type']
-    except: pass
-    
-    if d_data['mu'] != None: growth_fn.mu = d_data['mu']
-    if d_data['sigma'] != None: growth_fn.sigma = d_data['sigma']
+    for key in GROWTH_KEYS:
+        if key in d_data and d_data[key] is not None:
+            setattr(growth_fn, key, d_data[key])
        
-    # Board  
-    board_size = 64
-    if d_data['board_size'] != None: board_size = int(d_data['board_size'])
-    
-    seed = None
-    try: seed = int(d_data['seed'])
-    except: pass
-    
+    # Board
+    board_size = _coerce(d_data, 'board_size', int, 64)
+    seed = _coerce(d_data, 'seed', int, None)
+
     board = Board(board_size, seed=seed) # Create board
-    try: 
-        if type(d_data['board']) != None: 
-            board.board = d_data['board'] # if provided
-    except: pass
+    if d_data.get('board') is not None:
+        board.board = np.asarray(d_data['board'], dtype=DTYPE) # if provided
 
     # General simulation params
-    frames = 100
-    try: frames = int(d_data['frames'])
-    except: pass
-    
-    dt = 0.1 # timestep
-    if d_data['dt'] != None: dt = float(d_data['dt'])
-    
+    frames = _coerce(d_data, 'frames', int, 100)
+    dt = _coerce(d_data, 'dt', float, 0.1) # timestep
+
     # Run the simulation and animate
     print('Running simulation... ')
     game_of_life = Automaton(board, kernel, growth_fn, dT=dt)
     game_of_life.animate(frames)
     print('Simulation complete!')
 
-    outfile = 'output.mp4'
-    try: 
-        if d_data['outfile'] != None: 
-            outfile = d_data['outfile']
-    except: pass
+    outfile = _coerce(d_data, 'outfile', str, 'output.mp4')
     print('Saving simulation as ./outputs/{}... (may take several minutes)'.format(outfile))
     game_of_life.save_animation(outfile)
     print('Saving complete!')
-    
+
     # Save to json
-    try: 
-        if d_data['json'] != None: 
-            print('Saving results as ./datafiles/{}... '.format(d_data['json']))
-            game_of_life.save_json(d_data['json'])
-    except: pass
-    
-    # Save a figure showing the kernel and growth funcion 
-    try:
-        if d_data['verbose'] == True:
-            
-            game_of_life.plot_kernel_info(save=True)
-            
-            print('Saving final board state as ./outputs/board.png')
-            plt.figure()
-            plt.imshow(game_of_life.board)
-            plt.savefig('./outputs/board.png')
-    except: pass
-    
+    if d_data.get('json') is not None:
+        print('Saving results as ./datafiles/{}... '.format(d_data['json']))
+        game_of_life.save_json(d_data['json'])
+
+    # Save a figure showing the kernel and growth funcion
+    if d_data.get('verbose') == True:
+        from matplotlib import pyplot as plt # deferred - only this branch renders directly
+
+        game_of_life.plot_kernel_info(save=True)
+
+        print('Saving final board state as ./outputs/board.png')
+        plt.figure()
+        plt.imshow(game_of_life.board)
+        plt.savefig('./outputs/board.png')
+
     print('Complete! :)') # END
     return(0)
     
@@ -309,35 +329,34 @@ def validate_args(args:dict) -> dict:
     Args:
         args (dict): CLI args from user
 
+    Raises:
+        argparse.ArgumentTypeError: If an argument is non-numeric or out of range
+
     Returns:
         dict: Cleaned and checked args
     """
-    
+
     # Convert numeric args to floats
     for arg in NUMERIC_ARGS:
-        
+
         if args[arg] != None:
             try:
                 args[arg] = float(args[arg])
             except ValueError:
-                print('ERROR: --{} must be a numeric value'.format(arg.replace('_','-')))
-                return(-1)
+                raise argparse.ArgumentTypeError('--{} must be a numeric value'.format(_KEBAB[arg]))
             if args[arg] < 0:
-                print('ERROR: --{} must be greater then zero'.format(arg.replace('_','-')))
-                return(-1)
-    
+                raise argparse.ArgumentTypeError('--{} must be greater then zero'.format(_KEBAB[arg]))
+
     # Check the kernel peaks are all numeric
     if args['kernel_peaks'] != None:
         try:
             args['kernel_peaks'] = [float(i) for i in args['kernel_peaks']]
         except ValueError:
-            print('ERROR: --kernel-peaks must be a numeric')
-            return(-1)
+            raise argparse.ArgumentTypeError('--kernel-peaks must be a numeric')
         for i in args['kernel_peaks']:
             if i < 0 or i > 1:
-                print('ERROR: --kernel-peaks must be between 0 and 1')
-                return(-1)
- 
+                raise argparse.ArgumentTypeError('--kernel-peaks must be between 0 and 1')
+
     return args
         
 def handle_args(args:dict) -> None:
@@ -347,12 +366,16 @@ def handle_args(args:dict) -> None:
         args (dict): CLI arguments from user
     """
     print_welcome() # Welcome message
-    
-    args = validate_args(args) # Clean args
-    if args == -1:
+
+    try:
+        args = validate_args(args) # Clean args
+    except argparse.ArgumentTypeError as e:
+        # Previously validate_args returned -1 on failure, which handle_args could miss
+        # and let a partially-validated dict through to run_simulation
+        print('ERROR: {}'.format(e))
         exit(-1)
-        
-    elif args['list_demos']: # List the available demos
+
+    if args['list_demos']: # List the available demos
         print_demos()
         exit(0)
         